@@ -11,6 +11,8 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import asyncio
+import inspect
 import os
 from typing import Literal, Optional, Union, Any
 from google import genai
@@ -67,8 +69,11 @@ class BrowserAgent:
         query: str,
         model_name: str,
         verbose: bool = True,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
     ):
         self._browser_computer = browser_computer
+        # Event loop that owns an async computer when the agent loop runs in a worker thread.
+        self._loop = loop
         self._query = query
         self._model_name = model_name
         self._verbose = verbose
@@ -193,6 +198,19 @@ class BrowserAgent:
         else:
             raise ValueError(f"Unsupported function: {action}")
 
+    def _run_action(self, action: types.FunctionCall) -> FunctionResponseT:
+        """Runs the action, awaiting it if the computer is async."""
+        result = self.handle_action(action)
+        if not inspect.isawaitable(result):
+            return result
+        if self._loop is None:
+            result.close()
+            raise RuntimeError(
+                "Async computer actions require the event loop that owns the computer; "
+                "pass `loop` to BrowserAgent."
+            )
+        return asyncio.run_coroutine_threadsafe(result, self._loop).result()
+
     def get_model_response(
         self, max_retries=5, base_delay_s=1
     ) -> types.GenerateContentResponse:
@@ -323,21 +341,23 @@ class BrowserAgent:
                 with console.status(
                     "Sending command to Computer...", spinner_style=None
                 ):
-                    fc_result = self.handle_action(function_call)
+                    fc_result = self._run_action(function_call)
             else:
-                fc_result = self.handle_action(function_call)
+                fc_result = self._run_action(function_call)
             if isinstance(fc_result, EnvState):
                 function_responses.append(
                     FunctionResponse(
                         name=function_call.name,
                         response={
                             "url": fc_result.url,
+                            "timed_out": fc_result.timed_out,
                             **extra_fr_fields,
                         },
                         parts=[
                             types.FunctionResponsePart(
                                 inline_data=types.FunctionResponseBlob(
-                                    mime_type="image/png", data=fc_result.screenshot
+                                    mime_type=fc_result.mime_type,
+                                    data=fc_result.screenshot,
                                 )
                             )
                         ],
@@ -17,14 +17,19 @@ from typing import Literal
 
 
 class EnvState(pydantic.BaseModel):
-    # The screenshot in PNG format.
+    # The screenshot, encoded as `mime_type`.
     screenshot: bytes
     url: str
+    mime_type: str = "image/png"
+    # Whether the page was still busy when the screenshot was taken.
+    timed_out: bool = False
 
 
 class Computer(abc.ABC):
     """Defines an interface for environments."""
 
+    __slots__ = ()
+
     @abc.abstractmethod
     def screen_size(self) -> tuple[int, int]:
         """Returns the screen size of the environment."""
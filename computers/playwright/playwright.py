@@ -3,17 +3,21 @@
 # Licensed under the Apache License, Version 2.0 (the "License");
 # ...
 
-import logging
+import asyncio
+from functools import lru_cache
 import termcolor
-import time
-import os
-import sys
+from types import MappingProxyType
 from ..computer import Computer, EnvState
-from playwright.async_api import async_playwright
+from playwright.async_api import (
+    async_playwright,
+    Error as PlaywrightError,
+    TimeoutError as PlaywrightTimeoutError,
+)
 from typing import Literal
+from urllib.parse import urlsplit
 
 # Mapping of user-friendly keys to Playwright key names
-PLAYWRIGHT_KEY_MAP = {
+PLAYWRIGHT_KEY_MAP = MappingProxyType({
     "backspace": "Backspace",
     "tab": "Tab",
     "return": "Enter",
@@ -54,60 +58,291 @@ PLAYWRIGHT_KEY_MAP = {
     "f11": "F11",
     "f12": "F12",
     "command": "Meta",
+})
+
+CHROMIUM_ARGS = [
+    "--disable-extensions",
+    "--disable-file-system",
+    "--disable-plugins",
+    "--disable-dev-shm-usage",
+    "--disable-background-networking",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-gpu",
+]
+
+_URL_SCHEMES = ("http://", "https://")
+
+# Navigations only wait for DOMContentLoaded; slow subresources are left to
+# the network-idle wait in `current_state`.
+NAVIGATION_TIMEOUT_MS = 8000
+
+# How long an action that may navigate (a click, Enter) waits for the main
+# frame to commit a new document before it is treated as non-navigating.
+NAVIGATION_COMMIT_TIMEOUT_MS = 500
+
+
+@lru_cache(maxsize=256)
+def _translate_keys(keys: tuple[str, ...]) -> tuple[str, ...]:
+    return tuple(PLAYWRIGHT_KEY_MAP.get(k.lower(), k) for k in keys)
+
+
+# Tracks in-flight fetch/XHR requests in `window.__pendingRequests`, and when
+# the last one settled in `window.__requestsSettledAt`, so that `current_state`
+# can wait for the page to go network-idle before capturing.
+PENDING_REQUESTS_SCRIPT = """
+(() => {
+    if (window.__pendingRequests !== undefined) return;
+    window.__pendingRequests = 0;
+    window.__requestsSettledAt = 0;
+    const settle = () => {
+        window.__pendingRequests = Math.max(0, window.__pendingRequests - 1);
+        window.__requestsSettledAt = performance.now();
+    };
+    const originalFetch = window.fetch;
+    if (originalFetch) {
+        window.fetch = function (...args) {
+            window.__pendingRequests++;
+            try {
+                return originalFetch.apply(this, args).finally(settle);
+            } catch (e) {
+                settle();
+                throw e;
+            }
+        };
+    }
+    const originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function (...args) {
+        window.__pendingRequests++;
+        this.addEventListener("loadend", settle, { once: true });
+        try {
+            return originalSend.apply(this, args);
+        } catch (e) {
+            settle();
+            throw e;
+        }
+    };
+})();
+"""
+
+# Returns how many ms the page has been network-idle, or -1 while requests are
+# in flight or the document is still parsing.
+PENDING_REQUESTS_PROBE = """
+() => {
+    if (document.readyState === "loading" || window.__pendingRequests > 0) return -1;
+    return performance.now() - (window.__requestsSettledAt || 0);
 }
+"""
+
+# Creates the mouse feedback circle once per top-level document;
+# `highlight_mouse` only moves it.
+HIGHLIGHT_SCRIPT = """
+(() => {
+    if (window !== window.top) return;
+    const div = document.createElement("div");
+    div.id = "playwright-feedback-circle";
+    Object.assign(div.style, {
+        pointerEvents: "none",
+        border: "4px solid red",
+        borderRadius: "50%",
+        width: "20px",
+        height: "20px",
+        position: "fixed",
+        zIndex: "9999",
+        display: "none",
+    });
+    const attach = () => document.body.appendChild(div);
+    if (document.body) {
+        attach();
+    } else {
+        document.addEventListener("DOMContentLoaded", attach);
+    }
+})();
+"""
+
+MOVE_HIGHLIGHT_SCRIPT = """
+(x, y) => {
+    const div = document.getElementById("playwright-feedback-circle");
+    if (!div) return;
+    div.style.left = x - 10 + "px";
+    div.style.top = y - 10 + "px";
+    div.style.display = "block";
+    clearTimeout(window.__highlightTimeout);
+    window.__highlightTimeout = setTimeout(() => { div.style.display = "none"; }, 2000);
+}
+"""
+
+# Clears the focused editable text <input>/<textarea> through the native value
+# setter so frameworks that track the value (e.g. React) see the change.
+# Returns false for any other element so the caller can fall back to keys.
+CLEAR_INPUT_SCRIPT = """
+() => {
+    const textTypes = ["text", "search", "url", "tel", "email", "password", "number"];
+    const el = document.activeElement;
+    let proto;
+    if (el instanceof HTMLTextAreaElement) {
+        proto = HTMLTextAreaElement.prototype;
+    } else if (el instanceof HTMLInputElement && textTypes.includes(el.type)) {
+        proto = HTMLInputElement.prototype;
+    } else {
+        return false;
+    }
+    if (el.readOnly || el.disabled) return false;
+    Object.getOwnPropertyDescriptor(proto, "value").set.call(el, "");
+    el.dispatchEvent(new Event("input", { bubbles: true }));
+    return true;
+}
+"""
 
 
 class PlaywrightComputer(Computer):
     """Async Playwright Computer for Browser Automation"""
 
+    __slots__ = (
+        "_initial_url",
+        "_screen_size",
+        "_search_engine_url",
+        "_highlight_mouse",
+        "_network_idle_ms",
+        "_network_idle_timeout_ms",
+        "_playwright",
+        "_browser",
+        "_owns_browser",
+        "_context",
+        "_page",
+        "_cdp",
+        "_action_started_at",
+        "_page_lock",
+    )
+
     def __init__(
         self,
         screen_size: tuple[int, int],
         initial_url: str = "https://www.google.com",
         search_engine_url: str = "https://www.google.com",
         highlight_mouse: bool = False,
+        network_idle_ms: int = 500,
+        network_idle_timeout_ms: int = 5000,
+        browser=None,
     ):
         self._initial_url = initial_url
         self._screen_size = screen_size
         self._search_engine_url = search_engine_url
         self._highlight_mouse = highlight_mouse
+        self._network_idle_ms = network_idle_ms
+        self._network_idle_timeout_ms = network_idle_timeout_ms
         self._playwright = None
-        self._browser = None
+        self._browser = browser
+        self._owns_browser = browser is None
         self._context = None
         self._page = None
+        self._cdp = None
+        # Loop time at which the latest action began; see `_wait_for_network_idle`.
+        self._action_started_at = None
+        # Held while capturing state so a tab swap can't close the page mid-capture.
+        self._page_lock = asyncio.Lock()
 
     async def _handle_new_page(self, new_page):
-        new_url = new_page.url
-        await new_page.close()
-        await self._page.goto(new_url)
+        # Adopt the new tab rather than re-loading its URL in the current one.
+        new_page.on("close", self._handle_page_closed)
+        try:
+            await self._await_navigation(
+                new_page.wait_for_load_state("domcontentloaded")
+            )
+            cdp = await self._context.new_cdp_session(new_page)
+        except PlaywrightError:
+            # The tab closed itself (e.g. an OAuth popup); keep the current page.
+            return
+        async with self._page_lock:
+            # Skip tabs that closed, pages already recovered to by
+            # _handle_page_closed, and anything after __aexit__.
+            if new_page.is_closed() or self._page in (new_page, None):
+                return
+            old_page = self._page
+            self._page, self._cdp = new_page, cdp
+            try:
+                await old_page.close()
+            except PlaywrightError:
+                pass
+
+    async def _handle_page_closed(self, page):
+        # Fall back to a page that is still open if the active one goes away,
+        # or to a fresh blank page if none is left.
+        if page is not self._page:
+            return
+        open_pages = [p for p in self._context.pages if not p.is_closed()]
+        try:
+            self._page = open_pages[-1] if open_pages else await self._context.new_page()
+            self._cdp = await self._context.new_cdp_session(self._page)
+        except PlaywrightError:
+            self._cdp = None
+
+    async def _await_navigation(self, navigation) -> None:
+        try:
+            await navigation
+        except PlaywrightTimeoutError:
+            # The page is still loading; current_state keeps waiting for it.
+            pass
+
+    async def _run_navigating_action(self, action) -> bool:
+        """Runs an action that may start a navigation.
+
+        Returns True if the main frame committed a navigation shortly after.
+        """
+        try:
+            async with self._page.expect_navigation(
+                wait_until="commit", timeout=NAVIGATION_COMMIT_TIMEOUT_MS
+            ):
+                await action
+        except PlaywrightTimeoutError:
+            return False
+        return True
+
+    async def _run_script(self, expression: str) -> None:
+        """Runs JS for its side effects only, without sending a result back."""
+        if self._cdp is None:
+            await self._page.evaluate(expression)
+            return
+        await self._cdp.send(
+            "Runtime.evaluate",
+            {"expression": expression, "returnByValue": False, "awaitPromise": False},
+        )
+
+    @staticmethod
+    async def launch_browser(playwright):
+        """Launches a headless Chromium that can be shared between computers."""
+        return await playwright.chromium.launch(args=CHROMIUM_ARGS, headless=True)
 
     async def __aenter__(self):
-        print("Creating async Playwright session...")
-        self._playwright = await async_playwright().start()
-        self._browser = await self._playwright.chromium.launch(
-            args=[
-                "--disable-extensions",
-                "--disable-file-system",
-                "--disable-plugins",
-                "--disable-dev-shm-usage",
-                "--disable-background-networking",
-                "--disable-default-apps",
-                "--disable-sync",
-            ],
-            headless=True,
-        )
+        if self._browser is None:
+            print("Creating async Playwright session...")
+            self._playwright = await async_playwright().start()
+            self._browser = await self.launch_browser(self._playwright)
         self._context = await self._browser.new_context(
             viewport={"width": self._screen_size[0], "height": self._screen_size[1]}
         )
+        self._context.set_default_navigation_timeout(NAVIGATION_TIMEOUT_MS)
+        await self._context.add_init_script(script=PENDING_REQUESTS_SCRIPT)
+        if self._highlight_mouse:
+            await self._context.add_init_script(script=HIGHLIGHT_SCRIPT)
         self._page = await self._context.new_page()
-        await self._page.goto(self._initial_url)
-        self._context.on("page", lambda page: self._handle_new_page(page))
+        self._cdp = await self._context.new_cdp_session(self._page)
+        await self._await_navigation(
+            self._page.goto(self._initial_url, wait_until="domcontentloaded")
+        )
+        self._page.on("close", self._handle_page_closed)
+        self._context.on("page", self._handle_new_page)
         termcolor.cprint("Started async Playwright.", color="green", attrs=["bold"])
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
+        # Detach the active page so closing the context doesn't trigger recovery.
+        self._page = None
         if self._context:
             await self._context.close()
+        # A browser injected by the caller is left running for reuse.
+        if not self._owns_browser:
+            return
         if self._browser:
             await self._browser.close()
         if self._playwright:
@@ -117,15 +352,21 @@ class PlaywrightComputer(Computer):
         return await self.current_state()
 
     async def click_at(self, x: int, y: int):
-        await self.highlight_mouse(x, y)
-        await self._page.mouse.click(x, y)
-        await self._page.wait_for_load_state()
-        return await self.current_state()
+        self._start_action()
+        navigated = await self._run_navigating_action(
+            asyncio.gather(
+                self.highlight_mouse(x, y),
+                self._page.mouse.click(x, y),
+            )
+        )
+        return await self.current_state(navigated=navigated)
 
     async def hover_at(self, x: int, y: int):
-        await self.highlight_mouse(x, y)
-        await self._page.mouse.move(x, y)
-        await self._page.wait_for_load_state()
+        self._start_action()
+        await asyncio.gather(
+            self.highlight_mouse(x, y),
+            self._page.mouse.move(x, y),
+        )
         return await self.current_state()
 
     async def type_text_at(
@@ -136,31 +377,48 @@ class PlaywrightComputer(Computer):
         press_enter: bool = False,
         clear_before_typing: bool = True,
     ) -> EnvState:
-        await self.highlight_mouse(x, y)
-        await self._page.mouse.click(x, y)
-        await self._page.wait_for_load_state()
+        self._start_action()
+        await asyncio.gather(
+            self.highlight_mouse(x, y),
+            self._page.mouse.click(x, y),
+        )
+
+        # Keys are pressed directly so only the final current_state settles
+        # and captures the page.
+        if clear_before_typing and not await self._page.evaluate(CLEAR_INPUT_SCRIPT):
+            await self._page.keyboard.press("ControlOrMeta+A")
+            await self._page.keyboard.press("Delete")
+
+        # Enter, pressed explicitly or for a newline, may submit a form.
+        if press_enter or "\n" in text or "\r" in text:
+            navigated = await self._run_navigating_action(
+                self._type_text(text, press_enter)
+            )
+        else:
+            await self._type_text(text, press_enter=False)
+            navigated = False
 
-        if clear_before_typing:
-            if sys.platform == "darwin":
-                await self.key_combination(["Command", "A"])
-            else:
-                await self.key_combination(["Control", "A"])
-            await self.key_combination(["Delete"])
+        return await self.current_state(navigated=navigated)
 
-        await self._page.keyboard.type(text)
+    async def _type_text(self, text: str, press_enter: bool) -> None:
+        # insert_text sends each line in one call but only fires input events, so
+        # newlines are pressed as Enter, as keyboard.type would.
+        lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+        for i, line in enumerate(lines):
+            if i:
+                await self._page.keyboard.press("Enter")
+            if line:
+                await self._page.keyboard.insert_text(line)
 
         if press_enter:
-            await self.key_combination(["Enter"])
-
-        await self._page.wait_for_load_state()
-        return await self.current_state()
+            await self._page.keyboard.press("Enter")
 
     async def _horizontal_document_scroll(self, direction: Literal["left", "right"]) -> EnvState:
+        self._start_action()
         horizontal_scroll_amount = self.screen_size()[0] // 2
         sign = "-" if direction == "left" else ""
         scroll_argument = f"{sign}{horizontal_scroll_amount}"
-        await self._page.evaluate(f"window.scrollBy({scroll_argument}, 0);")
-        await self._page.wait_for_load_state()
+        await self._run_script(f"window.scrollBy({scroll_argument}, 0);")
         return await self.current_state()
 
     async def scroll_document(self, direction: Literal["up", "down", "left", "right"]) -> EnvState:
@@ -174,9 +432,11 @@ class PlaywrightComputer(Computer):
             raise ValueError("Unsupported direction: ", direction)
 
     async def scroll_at(self, x: int, y: int, direction: Literal["up", "down", "left", "right"], magnitude: int = 800) -> EnvState:
-        await self.highlight_mouse(x, y)
-        await self._page.mouse.move(x, y)
-        await self._page.wait_for_load_state()
+        self._start_action()
+        await asyncio.gather(
+            self.highlight_mouse(x, y),
+            self._page.mouse.move(x, y),
+        )
 
         dx, dy = 0, 0
         if direction == "up":
@@ -191,7 +451,6 @@ class PlaywrightComputer(Computer):
             raise ValueError("Unsupported direction: ", direction)
 
         await self._page.mouse.wheel(dx, dy)
-        await self._page.wait_for_load_state()
         return await self.current_state()
 
     async def wait_5_seconds(self) -> EnvState:
@@ -199,82 +458,126 @@ class PlaywrightComputer(Computer):
         return await self.current_state()
 
     async def go_back(self) -> EnvState:
-        await self._page.go_back()
-        await self._page.wait_for_load_state()
+        self._start_action()
+        await self._await_navigation(
+            self._page.go_back(wait_until="domcontentloaded")
+        )
         return await self.current_state()
 
     async def go_forward(self) -> EnvState:
-        await self._page.go_forward()
-        await self._page.wait_for_load_state()
+        self._start_action()
+        await self._await_navigation(
+            self._page.go_forward(wait_until="domcontentloaded")
+        )
         return await self.current_state()
 
     async def search(self) -> EnvState:
         return await self.navigate(self._search_engine_url)
 
     async def navigate(self, url: str) -> EnvState:
-        if not url.startswith(("http://", "https://")):
+        if not url.startswith(_URL_SCHEMES):
             url = "https://" + url
-        await self._page.goto(url)
-        await self._page.wait_for_load_state()
+        if not urlsplit(url).netloc:
+            raise ValueError("Invalid URL: ", url)
+        self._start_action()
+        await self._await_navigation(
+            self._page.goto(url, wait_until="domcontentloaded")
+        )
         return await self.current_state()
 
     async def key_combination(self, keys: list[str]) -> EnvState:
-        keys = [PLAYWRIGHT_KEY_MAP.get(k.lower(), k) for k in keys]
-
-        for key in keys[:-1]:
-            await self._page.keyboard.down(key)
-        await self._page.keyboard.press(keys[-1])
-        for key in reversed(keys[:-1]):
-            await self._page.keyboard.up(key)
+        self._start_action()
+        keys = _translate_keys(tuple(keys))
+
+        # A "+"-joined chord is pressed (modifiers held, then released) in a
+        # single driver call instead of one call per key down/up.
+        chord = self._page.keyboard.press("+".join(keys))
+        if "Enter" in keys:
+            navigated = await self._run_navigating_action(chord)
+        else:
+            await chord
+            navigated = False
 
-        return await self.current_state()
+        return await self.current_state(navigated=navigated)
 
     async def drag_and_drop(self, x: int, y: int, destination_x: int, destination_y: int) -> EnvState:
-        await self.highlight_mouse(x, y)
-        await self._page.mouse.move(x, y)
-        await self._page.wait_for_load_state()
+        self._start_action()
+        await asyncio.gather(
+            self.highlight_mouse(x, y),
+            self._page.mouse.move(x, y),
+        )
         await self._page.mouse.down()
-        await self._page.wait_for_load_state()
-        await self.highlight_mouse(destination_x, destination_y)
-        await self._page.mouse.move(destination_x, destination_y)
-        await self._page.wait_for_load_state()
+        await asyncio.gather(
+            self.highlight_mouse(destination_x, destination_y),
+            self._page.mouse.move(destination_x, destination_y),
+        )
         await self._page.mouse.up()
         return await self.current_state()
 
-    async def current_state(self) -> EnvState:
-        await self._page.wait_for_load_state()
-        await self._page.wait_for_timeout(500)  # ensure page finished rendering
-        screenshot_bytes = await self._page.screenshot(type="png", full_page=False)
-        return EnvState(screenshot=screenshot_bytes, url=self._page.url)
+    def _start_action(self) -> None:
+        self._action_started_at = asyncio.get_running_loop().time()
+
+    async def _wait_for_network_idle(self) -> bool:
+        """Waits until no fetch/XHR requests have been in flight for the idle window.
+
+        Idle time is counted from the later of the last settled request and the
+        start of the current action, so every action gets a full window in which
+        to kick off requests or a navigation.
+
+        Returns True if the hard timeout was hit before the page went idle.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._network_idle_timeout_ms / 1000
+        while True:
+            try:
+                idle_ms = await self._page.evaluate(PENDING_REQUESTS_PROBE)
+            except PlaywrightError:
+                # The execution context is torn down while navigating.
+                idle_ms = -1
+            if idle_ms >= 0 and self._action_started_at is not None:
+                idle_ms = min(idle_ms, (loop.time() - self._action_started_at) * 1000)
+            if idle_ms >= self._network_idle_ms:
+                return False
+            remaining_s = deadline - loop.time()
+            if remaining_s <= 0:
+                return True
+            # Sleep out the rest of the idle window, or poll while still busy.
+            wait_s = (self._network_idle_ms - idle_ms) / 1000 if idle_ms >= 0 else 0.05
+            await asyncio.sleep(min(wait_s, remaining_s))
+
+    async def current_state(self, navigated: bool = False) -> EnvState:
+        # Actions that committed a navigation wait for the new document to parse.
+        if navigated:
+            await self._await_navigation(
+                self._page.wait_for_load_state("domcontentloaded")
+            )
+        async with self._page_lock:
+            timed_out = await self._wait_for_network_idle()
+            page = self._page
+            try:
+                screenshot_bytes = await page.screenshot(
+                    type="jpeg", quality=70, full_page=False
+                )
+            except PlaywrightError:
+                # The active page closed itself; retry once on its replacement.
+                if self._page is page:
+                    raise
+                page = self._page
+                screenshot_bytes = await page.screenshot(
+                    type="jpeg", quality=70, full_page=False
+                )
+            return EnvState(
+                screenshot=screenshot_bytes,
+                url=page.url,
+                mime_type="image/jpeg",
+                timed_out=timed_out,
+            )
 
     def screen_size(self) -> tuple[int, int]:
-        viewport_size = self._page.viewport_size
-        if viewport_size:
-            return viewport_size["width"], viewport_size["height"]
+        # The viewport is fixed to `_screen_size` when the context is created.
         return self._screen_size
 
     async def highlight_mouse(self, x: int, y: int):
         if not self._highlight_mouse:
             return
-        await self._page.evaluate(
-            f"""
-            () => {{
-                const element_id = "playwright-feedback-circle";
-                const div = document.createElement('div');
-                div.id = element_id;
-                div.style.pointerEvents = 'none';
-                div.style.border = '4px solid red';
-                div.style.borderRadius = '50%';
-                div.style.width = '20px';
-                div.style.height = '20px';
-                div.style.position = 'fixed';
-                div.style.zIndex = '9999';
-                document.body.appendChild(div);
-                div.hidden = false;
-                div.style.left = {x}-10+'px';
-                div.style.top = {y}-10+'px';
-                setTimeout(() => {{ div.hidden = true; }}, 2000);
-            }}
-        """
-        )
-        await self._page.wait_for_timeout(1000)
+        await self._run_script(f"({MOVE_HIGHLIGHT_SCRIPT})({x}, {y});")
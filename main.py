@@ -3,6 +3,8 @@
 # Licensed under the Apache License, Version 2.0 (the "License");
 # ...
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import os
 from agent import BrowserAgent
 from computers import BrowserbaseComputer, PlaywrightComputer
@@ -12,7 +14,7 @@ from pydantic import BaseModel
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.concurrency import run_in_threadpool
+from playwright.async_api import async_playwright
 
 import sys
 print(sys.executable)
@@ -39,6 +41,16 @@ genai.configure(api_key=api_key)
 
 PLAYWRIGHT_SCREEN_SIZE = (1440, 900)
 
+# Shared across requests; each /chat call only opens a new BrowserContext.
+PLAYWRIGHT = None
+BROWSER = None
+
+# Caps the number of browser sessions running at once; extra requests queue.
+MAX_BROWSERS = int(os.getenv("MAX_BROWSERS", "8"))
+SEM = asyncio.Semaphore(MAX_BROWSERS)
+# One agent-loop thread per admitted session, so none waits on the default executor.
+AGENT_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_BROWSERS)
+
 # ---------------- Request Model ----------------
 class ChatRequest(BaseModel):
     query: str
@@ -47,6 +59,21 @@ class ChatRequest(BaseModel):
     highlight_mouse: bool = False
     model: str = 'gemini-2.5-computer-use-preview-10-2025'
 
+# ---------------- Lifecycle ----------------
+@app.on_event("startup")
+async def start_browser():
+    global PLAYWRIGHT, BROWSER
+    PLAYWRIGHT = await async_playwright().start()
+    BROWSER = await PlaywrightComputer.launch_browser(PLAYWRIGHT)
+
+@app.on_event("shutdown")
+async def stop_browser():
+    AGENT_EXECUTOR.shutdown(wait=False)
+    if BROWSER:
+        await BROWSER.close()
+    if PLAYWRIGHT:
+        await PLAYWRIGHT.stop()
+
 # ---------------- Routes ----------------
 @app.get("/")
 def root():
@@ -60,6 +87,7 @@ async def run_agent(request: ChatRequest):
             screen_size=PLAYWRIGHT_SCREEN_SIZE,
             initial_url=request.initial_url,
             highlight_mouse=request.highlight_mouse,
+            browser=BROWSER,
         )
     elif request.env == "browserbase":
         env_instance = BrowserbaseComputer(
@@ -69,14 +97,21 @@ async def run_agent(request: ChatRequest):
     else:
         return {"error": f"Unknown environment: {request.env}"}
 
+    if SEM.locked():
+        print(f"All {MAX_BROWSERS} browser sessions busy, queueing request.")
+
     # Run the agent using async context
-    async with env_instance as browser_computer:
+    async with SEM, env_instance as browser_computer:
+        loop = asyncio.get_running_loop()
         agent = BrowserAgent(
             browser_computer=browser_computer,
             query=request.query,
             model_name=request.model,
+            loop=loop,
         )
-        await run_in_threadpool(agent.agent_loop)
+        # The model calls block, so the loop runs in a worker thread while
+        # browser actions are scheduled back onto this event loop.
+        await loop.run_in_executor(AGENT_EXECUTOR, agent.agent_loop)
 
     return {"result": "Task completed by the agent."}
 
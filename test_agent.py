@@ -12,7 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import os
+import threading
 import unittest
 from unittest.mock import MagicMock, patch
 from google.genai import types
@@ -62,6 +64,42 @@ class TestBrowserAgent(unittest.TestCase):
         self.agent.handle_action(action)
         self.mock_browser_computer.navigate.assert_called_once_with("https://example.com")
 
+    def test_run_action_awaits_async_computer_on_loop(self):
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever)
+        thread.start()
+        self.addCleanup(loop.close)
+        self.addCleanup(thread.join)
+        self.addCleanup(loop.call_soon_threadsafe, loop.stop)
+
+        env_state = EnvState(screenshot=b"screenshot", url="https://example.com")
+        ran_on = []
+
+        async def navigate(url):
+            ran_on.append(asyncio.get_running_loop())
+            return env_state
+
+        self.mock_browser_computer.navigate.side_effect = navigate
+        agent = BrowserAgent(
+            browser_computer=self.mock_browser_computer,
+            query="test query",
+            model_name="test_model",
+            loop=loop,
+        )
+        action = types.FunctionCall(name="navigate", args={"url": "https://example.com"})
+
+        self.assertEqual(agent._run_action(action), env_state)
+        self.assertEqual(ran_on, [loop])
+
+    def test_run_action_async_computer_without_loop(self):
+        async def navigate(url):
+            return EnvState(screenshot=b"screenshot", url=url)
+
+        self.mock_browser_computer.navigate.side_effect = navigate
+        action = types.FunctionCall(name="navigate", args={"url": "https://example.com"})
+        with self.assertRaises(RuntimeError):
+            self.agent._run_action(action)
+
     def test_handle_action_unknown_function(self):
         action = types.FunctionCall(name="unknown_function", args={})
         with self.assertRaises(ValueError):
@@ -97,7 +135,12 @@ class TestBrowserAgent(unittest.TestCase):
         mock_response.candidates = [mock_candidate]
         mock_get_model_response.return_value = mock_response
 
-        mock_env_state = EnvState(screenshot=b"screenshot", url="https://example.com")
+        mock_env_state = EnvState(
+            screenshot=b"screenshot",
+            url="https://example.com",
+            mime_type="image/jpeg",
+            timed_out=True,
+        )
         mock_handle_action.return_value = mock_env_state
 
         result = self.agent.run_one_iteration()
@@ -105,6 +148,13 @@ class TestBrowserAgent(unittest.TestCase):
         self.assertEqual(result, "CONTINUE")
         mock_handle_action.assert_called_once_with(function_call)
         self.assertEqual(len(self.agent._contents), 3)
+        function_response = self.agent._contents[2].parts[0].function_response
+        self.assertEqual(
+            function_response.response,
+            {"url": "https://example.com", "timed_out": True},
+        )
+        self.assertEqual(function_response.parts[0].inline_data.mime_type, "image/jpeg")
+        self.assertEqual(function_response.parts[0].inline_data.data, b"screenshot")
 
 
 if __name__ == "__main__":